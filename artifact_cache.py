@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+# =====================================
+# CONTENT-ADDRESSED DISK CACHE
+# =====================================
+
+def hash_file(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def make_key(*parts):
+    # Stable digest over an ordered list of str/bytes/JSON-able parts
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, bytes):
+            data = part
+        elif isinstance(part, str):
+            data = part.encode("utf-8")
+        else:
+            data = json.dumps(part, sort_keys=True).encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class ContentCache:
+    def __init__(self, root, suffix, ttl_seconds=None, max_entries=None, max_bytes=None):
+        self.root = root
+        self.suffix = suffix
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + self.suffix)
+
+    def get_json(self, key):
+        path = self._lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self._discard(path)
+            return None
+
+    def put_json(self, key, value):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp, path)
+        self.evict()
+
+    def get_file(self, key, dest_path):
+        # Copies the cached artifact to dest_path; returns True on hit
+        path = self._lookup(key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest_path)
+            return True
+        except OSError:
+            self._discard(path)
+            return False
+
+    def put_file(self, key, src_path):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(src_path, tmp)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        # Expired entries first (by write time), then least recently used until under the caps
+        with self._lock:
+            entries = self._entries()
+            now = time.time()
+            kept = []
+            for used_at, written_at, size, path in entries:
+                if self.ttl_seconds is not None and now - written_at > self.ttl_seconds:
+                    self._remove(path)
+                else:
+                    kept.append((used_at, size, path))
+            kept.sort()
+            total = sum(size for _, size, _ in kept)
+            while kept and (
+                (self.max_entries is not None and len(kept) > self.max_entries)
+                or (self.max_bytes is not None and total > self.max_bytes)
+            ):
+                _, size, path = kept.pop(0)
+                self._remove(path)
+                total -= size
+
+    def stats(self):
+        entries = self._entries()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, _, size, _ in entries)
+        }
+
+    def _lookup(self, key):
+        path = self.path_for(key)
+        with self._lock:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.misses += 1
+                return None
+            if self.ttl_seconds is not None and time.time() - st.st_mtime > self.ttl_seconds:
+                self._remove(path)
+                self.misses += 1
+                return None
+            # Mark as recently used via atime only; mtime stays the write time the TTL counts from
+            os.utime(path, ns=(time.time_ns(), st.st_mtime_ns))
+            self.hits += 1
+            return path
+
+    def _discard(self, path):
+        # Unreadable entry: undo the hit and drop it
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            self._remove(path)
+
+    def _entries(self):
+        entries = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for f in filenames:
+                if not f.endswith(self.suffix):
+                    continue
+                path = os.path.join(dirpath, f)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_atime, st.st_mtime, st.st_size, path))
+        return entries
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.evictions += 1
+        except OSError:
+            pass
+
+
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+def shared_cache(name, root, suffix, **limits):
+    # One instance per name so hit/miss counters aggregate across jobs
+    with _shared_lock:
+        if name not in _shared_caches:
+            _shared_caches[name] = ContentCache(root, suffix, **limits)
+        return _shared_caches[name]
+
+def cache_stats():
+    with _shared_lock:
+        caches = dict(_shared_caches)
+    return {name: cache.stats() for name, cache in caches.items()}
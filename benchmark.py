@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+# Offline benchmark: runs the real pipeline (image prep, merge, TTS padding, Whisper,
+# encodes) against local stand-ins for Gemini, deAPI and ElevenLabs.
+#
+#   python benchmark.py --jobs 1 2 4 --render-seconds 5 --failure-rate 0.1
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_SCENES = ["scene1.mp4", "scene2.mp4", "scene3.mp4", "scene4.mp4"]
+SAMPLE_VOICE = "final_voice.mp3"
+SAMPLE_IMAGES = {
+    "front": "uploads/front_front.png",
+    "left": "uploads/left_left.png",
+    "right": "uploads/right_right.png",
+    "back": "uploads/back_back.png",
+}
+
+# =====================================
+# FAKE deAPI + ElevenLabs SERVER
+# =====================================
+
+class FakeProfile:
+    def __init__(self, api_latency=0.2, render_seconds=10.0, tts_latency=1.0, failure_rate=0.0):
+        self.api_latency = api_latency
+        self.render_seconds = render_seconds
+        self.tts_latency = tts_latency
+        self.failure_rate = failure_rate
+
+
+class FakeApiServer:
+    def __init__(self, profile: FakeProfile):
+        self.profile = profile
+        self.requests = {} # request_id -> (submitted_at, sample scene file)
+        self.counts = {"submit": 0, "rate_limited": 0, "status": 0, "download": 0, "tts": 0}
+        self._lock = threading.Lock()
+        self._scene_cycle = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.base_url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                time.sleep(server.profile.api_latency)
+
+                if self.path.endswith("/deapi/img2video"):
+                    with server._lock:
+                        server.counts["submit"] += 1
+                        if random.random() < server.profile.failure_rate:
+                            server.counts["rate_limited"] += 1
+                            return self._json({"message": "Too Many Attempts."}, 429)
+                        request_id = uuid.uuid4().hex
+                        sample = SAMPLE_SCENES[server._scene_cycle % len(SAMPLE_SCENES)]
+                        server._scene_cycle += 1
+                        server.requests[request_id] = (time.time(), sample)
+                    return self._json({"data": {"request_id": request_id}})
+
+                if "/eleven/text-to-speech/" in self.path:
+                    with server._lock:
+                        server.counts["tts"] += 1
+                    time.sleep(server.profile.tts_latency)
+                    return self._file(os.path.join(ROOT, SAMPLE_VOICE), "audio/mpeg")
+
+                self._json({"message": "Not found"}, 404)
+
+            def do_GET(self):
+                status = re.search(r"/deapi/request-status/(\w+)$", self.path)
+                if status:
+                    with server._lock:
+                        server.counts["status"] += 1
+                        entry = server.requests.get(status.group(1))
+                    if not entry:
+                        return self._json({"message": "Unknown request"}, 404)
+                    submitted_at, sample = entry
+                    elapsed = time.time() - submitted_at
+                    progress = min(100, int(100 * elapsed / max(0.001, server.profile.render_seconds)))
+                    data = {"status": "processing", "progress": progress}
+                    if progress >= 100:
+                        data.update(status="done", result_url=f"{server.base_url}/files/{sample}")
+                    return self._json({"data": data})
+
+                if self.path.startswith("/files/"):
+                    with server._lock:
+                        server.counts["download"] += 1
+                    name = os.path.basename(self.path)
+                    return self._file(os.path.join(ROOT, name), "video/mp4")
+
+                self._json({"message": "Not found"}, 404)
+
+            def _json(self, payload, code=200):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _file(self, path, content_type):
+                with open(path, "rb") as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+# =====================================
+# FAKE GEMINI CLIENT
+# =====================================
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class _FakeFile:
+    def __init__(self, name):
+        self.name = name
+        self.state = "ACTIVE"
+
+
+class FakeGenaiClient:
+    # Drop-in for genai.Client: scene design JSON for image prompts, a script for video prompts
+    def __init__(self, latency=1.0, **kwargs):
+        self.models = self
+        self.files = self
+        self.latency = latency
+
+    def generate_content(self, model, contents):
+        time.sleep(self.latency)
+        prompt = contents[0] if contents and isinstance(contents[0], str) else ""
+        if '"scene1"' in prompt:
+            return _FakeResponse(json.dumps({
+                "scene1": "Hero reveal of the product in a dark studio",
+                "scene2": "Side profile with rim lighting",
+                "scene3": "Slow orbit showing depth",
+                "scene4": "Close-up of the key detail",
+            }))
+        return _FakeResponse("Meet the product. <break time=\"0.5s\"/> Built to <emphasis>stand out</emphasis>.")
+
+    def upload(self, file, config=None):
+        return _FakeFile(f"files/{uuid.uuid4().hex}")
+
+    def get(self, name):
+        return _FakeFile(name)
+
+    def delete(self, name):
+        pass
+
+# =====================================
+# BENCHMARK RUNNER
+# =====================================
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def run_job(work_root, api: FakeApiServer, args):
+    from video_pipeline import VideoConfig, VideoPipeline
+    from workspace import JobWorkspace
+
+    job_id = uuid.uuid4().hex
+    workspace = JobWorkspace(work_root, job_id)
+    config = VideoConfig()
+    config.DEAPI_KEYS = [f"bench-key-{i}" for i in range(args.keys)]
+    config.DEAPI_REQUESTS_PER_MINUTE = 6000
+    config.DEAPI_COOLDOWN_SECONDS = 1
+    config.DEAPI_BASE_URL = f"{api.base_url}/deapi"
+    config.ELEVEN_BASE_URL = f"{api.base_url}/eleven"
+    config.WHISPER_MODEL_SIZE = args.whisper_size
+    # Every job pays for the Gemini stand-in and the renders, so levels stay comparable
+    config.SCENE_CACHE_ENABLED = False
+    config.PROMPT_CACHE_ENABLED = False
+    config.update_images(
+        *(os.path.join(ROOT, SAMPLE_IMAGES[k]) for k in ("front", "left", "right", "back")),
+        work_dir=workspace.path
+    )
+
+    pipeline = VideoPipeline(config, workspace=workspace)
+    start = time.perf_counter()
+    pipeline.run_full_pipeline()
+    return {
+        "status": pipeline.status,
+        "seconds": time.perf_counter() - start,
+        "stages": pipeline.timings.breakdown()["totals"]
+    }
+
+
+def run_level(concurrency, api, args):
+    work_root = tempfile.mkdtemp(prefix=f"adgen-bench-{concurrency}-")
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        result = run_job(work_root, api, args)
+        with lock:
+            results.append(result)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    if not args.keep:
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    latencies = [r["seconds"] for r in results]
+    stages = {}
+    for r in results:
+        for stage, seconds in r["stages"].items():
+            stages.setdefault(stage, []).append(seconds)
+    return {
+        "concurrency": concurrency,
+        "completed": sum(1 for r in results if r["status"] == "Completed"),
+        "failed": sum(1 for r in results if r["status"] != "Completed"),
+        "wall_seconds": round(wall, 2),
+        "jobs_per_minute": round(60 * len(results) / wall, 2) if wall else 0.0,
+        "latency_p50": round(percentile(latencies, 50), 2),
+        "latency_p95": round(percentile(latencies, 95), 2),
+        "stage_mean_seconds": {k: round(statistics.mean(v), 3) for k, v in sorted(stages.items())}
+    }
+
+
+def print_report(levels, counts):
+    print()
+    print(f"{'jobs':>5} {'ok':>4} {'fail':>5} {'wall s':>8} {'jobs/min':>9} {'p50 s':>8} {'p95 s':>8}")
+    for lv in levels:
+        print(f"{lv['concurrency']:>5} {lv['completed']:>4} {lv['failed']:>5} {lv['wall_seconds']:>8} "
+              f"{lv['jobs_per_minute']:>9} {lv['latency_p50']:>8} {lv['latency_p95']:>8}")
+    print()
+    stage_names = sorted({s for lv in levels for s in lv["stage_mean_seconds"]})
+    print("mean seconds per stage: " + "  ".join(f"[{lv['concurrency']} jobs]" for lv in levels))
+    for stage in stage_names:
+        row = "  ".join(f"{lv['stage_mean_seconds'].get(stage, 0):>9}" for lv in levels)
+        print(f"  {stage:<16} {row}")
+    print()
+    print(f"fake API calls: {counts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmark with local API stand-ins")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4], help="Concurrency levels to run")
+    parser.add_argument("--keys", type=int, default=2, help="Number of fake deAPI keys")
+    parser.add_argument("--api-latency", type=float, default=0.2)
+    parser.add_argument("--render-seconds", type=float, default=10.0, help="Fake img2video render time")
+    parser.add_argument("--gemini-latency", type=float, default=1.0)
+    parser.add_argument("--tts-latency", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Chance a submit is rate limited")
+    parser.add_argument("--whisper-size", default="tiny")
+    parser.add_argument("--render-mode", choices=["single_pass", "staged"], default=None)
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary job workspaces")
+    args = parser.parse_args()
+
+    os.environ.setdefault("POLL_MIN_INTERVAL", "0.5")
+    os.environ.setdefault("WHISPER_WARMUP", "0")
+    os.environ["GEMINI_FILE_UPLOAD"] = "1"
+    if args.render_mode:
+        os.environ["RENDER_MODE"] = args.render_mode
+
+    profile = FakeProfile(args.api_latency, args.render_seconds, args.tts_latency, args.failure_rate)
+    api = FakeApiServer(profile).start()
+    print(f"Fake APIs on {api.base_url}")
+
+    levels = []
+    with mock.patch("video_pipeline.genai.Client", lambda **kw: FakeGenaiClient(latency=args.gemini_latency)):
+        for concurrency in args.jobs:
+            print(f"Running {concurrency} concurrent job(s)...")
+            levels.append(run_level(concurrency, api, args))
+    api.stop()
+
+    print_report(levels, api.counts)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"levels": levels, "api_calls": api.counts}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from artifact_cache import hash_file
+
+# =====================================
+# POOLED HTTP CLIENT
+# =====================================
+
+# GET/HEAD are retried on any transient failure; other methods only when the
+# request clearly never reached the upstream service, so jobs aren't double-submitted
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+RETRY_STATUSES = {500, 502, 503, 504}
+SAFE_RETRY_STATUSES = {502, 503}
+
+
+class HttpClient:
+    def __init__(self, pool_connections=10, pool_maxsize=32, connect_timeout=10, read_timeout=60,
+                 max_retries=3, backoff_base=0.5, backoff_max=10):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # One keep-alive pool per host, shared by every pipeline thread
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, url, retries=None, **kwargs):
+        method = method.upper()
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = self.max_retries if retries is None else retries
+        idempotent = method in IDEMPOTENT_METHODS
+
+        for attempt in range(attempts + 1):
+            self._rewind_files(kwargs.get("files"))
+            try:
+                resp = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= attempts:
+                    raise
+                self._backoff(attempt)
+                continue
+
+            retry_statuses = RETRY_STATUSES if idempotent else SAFE_RETRY_STATUSES
+            if resp.status_code in retry_statuses and attempt < attempts:
+                resp.close()
+                self._backoff(attempt)
+                continue
+            return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def download(self, url, dest_path, expected_sha256=None, chunk_size=1024 * 1024, max_resumes=3, **kwargs):
+        # Streams to <dest>.part in chunks, resumes with Range on drops, verifies, then renames
+        tmp_path = dest_path + ".part"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        expected_size = None
+
+        for attempt in range(max_resumes + 1):
+            offset = os.path.getsize(tmp_path) if os.path.exists(tmp_path) else 0
+            headers = dict(kwargs.get("headers") or {})
+            if offset:
+                headers["Range"] = f"bytes={offset}-"
+            try:
+                with self.get(url, stream=True, headers=headers) as resp:
+                    resp.raise_for_status()
+                    if offset and resp.status_code != 206:
+                        offset = 0 # Server ignored the Range header, start over
+                    expected_size = self._expected_size(resp, offset) or expected_size
+                    with open(tmp_path, "ab" if offset else "wb") as f:
+                        for chunk in resp.iter_content(chunk_size=chunk_size):
+                            if chunk:
+                                f.write(chunk)
+                size = os.path.getsize(tmp_path)
+                if expected_size is not None and size < expected_size:
+                    raise IOError(f"Incomplete download: {size}/{expected_size} bytes")
+                break
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code < 500:
+                    raise
+                if attempt >= max_resumes:
+                    raise
+                self._backoff(attempt)
+            except (requests.RequestException, IOError):
+                if attempt >= max_resumes:
+                    raise
+                self._backoff(attempt)
+
+        digest = hash_file(tmp_path)
+        if expected_sha256 and digest != expected_sha256.lower():
+            os.remove(tmp_path)
+            raise IOError(f"Checksum mismatch for {url}: {digest} != {expected_sha256}")
+        os.replace(tmp_path, dest_path)
+        return digest
+
+    def close(self):
+        self.session.close()
+
+    def _expected_size(self, resp, offset):
+        content_range = resp.headers.get("Content-Range", "")
+        if "/" in content_range and not content_range.endswith("/*"):
+            return int(content_range.rsplit("/", 1)[1])
+        length = resp.headers.get("Content-Length")
+        # Compressed responses report the encoded length, which can't be compared on disk
+        if length and not resp.headers.get("Content-Encoding"):
+            return offset + int(length)
+        return None
+
+    def _backoff(self, attempt):
+        # Exponential backoff with full jitter
+        time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt))))
+
+    def _rewind_files(self, files):
+        # Retries must resend upload bodies from the start
+        for value in (files or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            if hasattr(fileobj, "seek"):
+                fileobj.seek(0)
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+def shared_http_client():
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = HttpClient(
+                pool_maxsize=int(os.getenv("HTTP_POOL_SIZE", "32")),
+                connect_timeout=float(os.getenv("HTTP_CONNECT_TIMEOUT", "10")),
+                read_timeout=float(os.getenv("HTTP_READ_TIMEOUT", "120")),
+                max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3"))
+            )
+        return _shared_client
@@ -0,0 +1,41 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageFilter
+
+# =====================================
+# BATCH SCENE IMAGE PREP
+# =====================================
+# PIL's decode, resize, filter and encode release the GIL, so a thread pool runs the images
+# in parallel without the spawn/import cost of worker processes.
+
+def prepare_scene_image(path, target_w, target_h, blur_radius=30, bg_factor=8):
+    # Fitted image centered over a blurred, stretched copy of itself; returns PNG bytes
+    with Image.open(path) as src:
+        if src.format == "JPEG":
+            src.draft("RGB", (target_w, target_h)) # DCT-scaled decode, never below the target size
+        img = src.convert("RGB")
+    w, h = img.size
+
+    # Blur at 1/bg_factor scale and scale back up: same soft backdrop, a fraction of the work
+    small = (max(1, target_w // bg_factor), max(1, target_h // bg_factor))
+    bg = img.resize(small, Image.BILINEAR, reducing_gap=2.0)
+    bg = bg.filter(ImageFilter.GaussianBlur(blur_radius / bg_factor))
+    bg = bg.resize((target_w, target_h), Image.BICUBIC)
+
+    scale = min(target_w / w, target_h / h)
+    fg = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS, reducing_gap=3.0)
+    bg.paste(fg, ((target_w - fg.width) // 2, (target_h - fg.height) // 2))
+
+    buf = io.BytesIO()
+    bg.save(buf, "PNG", compress_level=1)
+    return buf.getvalue()
+
+
+def prepare_scene_images(paths, target_w, target_h, workers=4):
+    # {key: path} -> {key: PNG bytes}; all images are prepared together
+    if workers <= 1 or len(paths) <= 1:
+        return {k: prepare_scene_image(p, target_w, target_h) for k, p in paths.items()}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(paths)), thread_name_prefix="image-prep") as pool:
+        futures = {k: pool.submit(prepare_scene_image, p, target_w, target_h) for k, p in paths.items()}
+        return {k: f.result() for k, f in futures.items()}
@@ -0,0 +1,190 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+# =====================================
+# PERSISTENT JOB STORE (SQLite)
+# =====================================
+
+class JobStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                username TEXT,
+                status TEXT,
+                progress INTEGER DEFAULT 0,
+                payload TEXT,
+                logs TEXT,
+                error TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            )
+        """)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "batch_id" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN batch_id TEXT")
+        if "enqueued_at" not in columns:
+            # Queue order; reset on requeue so a resumed job waits behind everything already queued
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN enqueued_at REAL")
+            self._conn.execute("UPDATE jobs SET enqueued_at = created_at")
+        self._conn.execute("DROP INDEX IF EXISTS idx_jobs_status")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, enqueued_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (username, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_batch ON jobs (batch_id, created_at)")
+        # Jobs that were mid-run when the server died go back on the queue
+        self._conn.execute("UPDATE jobs SET status = 'Queued', started_at = NULL WHERE status = 'Running'")
+        # Batch jobs held for a shared scene design that never finished: let them design their own
+        self._conn.execute("UPDATE jobs SET status = 'Queued' WHERE status = 'Held'")
+        self._conn.commit()
+
+    def new_id(self):
+        return uuid.uuid4().hex
+
+    def enqueue(self, username, payload, job_id=None, batch_id=None, status="Queued"):
+        # status="Held" keeps the job out of claim_next until release_batch
+        job_id = job_id or self.new_id()
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, username, status, progress, payload, created_at, enqueued_at, batch_id) "
+                "VALUES (?, ?, ?, 0, ?, ?, ?, ?)",
+                (job_id, username, status, json.dumps(payload), now, now, batch_id)
+            )
+            self._conn.commit()
+        return job_id
+
+    def release_batch(self, batch_id):
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = 'Queued' WHERE batch_id = ? AND status = 'Held'", (batch_id,))
+            self._conn.commit()
+
+    def batch_jobs(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE batch_id = ? ORDER BY created_at", (batch_id,)
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def claim_next(self):
+        # Atomically move the oldest queued job to Running
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'Queued' ORDER BY enqueued_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'Running', started_at = ? WHERE id = ?",
+                (time.time(), row["id"])
+            )
+            self._conn.commit()
+        job = self._to_dict(row)
+        job["status"] = "Running"
+        return job
+
+    def update(self, job_id, **fields):
+        if "logs" in fields:
+            fields["logs"] = json.dumps(list(fields["logs"]))
+        if "payload" in fields:
+            fields["payload"] = json.dumps(fields["payload"])
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+            self._conn.commit()
+
+    def requeue(self, job_id, payload):
+        # Put a finished job back on the queue; only succeeds if it isn't queued or running already
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = 'Queued', progress = 0, error = NULL, started_at = NULL, finished_at = NULL, "
+                "enqueued_at = ?, payload = ? WHERE id = ? AND status NOT IN ('Held', 'Queued', 'Running')",
+                (time.time(), json.dumps(payload), job_id)
+            )
+            self._conn.commit()
+        return cur.rowcount == 1
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def latest_for_user(self, username):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE username = ? ORDER BY created_at DESC LIMIT 1", (username,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished_ids(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status IN ('Queued', 'Running')").fetchall()
+        return [r[0] for r in rows]
+
+    def queue_position(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = 'Queued' AND enqueued_at < (SELECT enqueued_at FROM jobs WHERE id = ?)",
+                (job_id,)
+            ).fetchone()
+        return row[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _to_dict(self, row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if job.get("payload") else {}
+        job["logs"] = json.loads(job["logs"]) if job.get("logs") else []
+        return job
+
+# =====================================
+# WORKER POOL
+# =====================================
+
+class JobWorkerPool:
+    def __init__(self, store: JobStore, handler, workers=2):
+        self.store = store
+        self.handler = handler
+        self.workers = max(1, workers)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker_loop, name=f"job-worker-{i + 1}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def notify(self):
+        # Called after enqueue so idle workers pick the job up immediately
+        self._wakeup.set()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._wakeup.wait(timeout=1.0)
+                self._wakeup.clear()
+                continue
+            try:
+                self.handler(job)
+            except Exception as e:
+                print(f"Job {job['id']} crashed: {e}")
+                self.store.update(job["id"], status="Failed", error=str(e), finished_at=time.time())
@@ -0,0 +1,135 @@
+import threading
+import time
+
+# =====================================
+# RATE-LIMIT-AWARE API KEY SCHEDULER
+# =====================================
+
+class _KeyState:
+    def __init__(self, key, capacity, refill_per_second, max_in_flight):
+        self.key = key
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.refill_per_second = refill_per_second
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.last_refill = time.monotonic()
+        self.submitted = 0
+        self.rate_limited = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_per_second)
+        self.last_refill = now
+
+    def available_at(self, now):
+        # Earliest moment this key could accept a request, ignoring in-flight slots
+        at = max(now, self.cooldown_until)
+        if self.tokens < 1:
+            at = max(at, now + (1 - self.tokens) / self.refill_per_second)
+        return at
+
+
+class KeyScheduler:
+    # Token bucket per key + cooldown windows + in-flight caps; picks the least-loaded healthy key
+    def __init__(self, keys, requests_per_minute=6, burst=2, max_in_flight=1, cooldown_seconds=20):
+        self.cooldown_seconds = cooldown_seconds
+        self._cond = threading.Condition()
+        self._states = [
+            _KeyState(k, max(1, burst), requests_per_minute / 60.0, max(1, max_in_flight))
+            for k in keys
+        ]
+
+    def acquire(self, timeout=None):
+        # Blocks only when no key has capacity; returns None if there are no keys at all
+        if not self._states:
+            return None
+        give_up = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                for s in self._states:
+                    s.refill(now)
+                ready = [
+                    s for s in self._states
+                    if s.cooldown_until <= now and s.in_flight < s.max_in_flight and s.tokens >= 1
+                ]
+                if ready:
+                    best = min(ready, key=lambda s: (s.in_flight / s.max_in_flight, -s.tokens))
+                    best.tokens -= 1
+                    best.in_flight += 1
+                    best.submitted += 1
+                    return best.key
+
+                # Sleep until the next key frees up (token refill / cooldown end) or a release
+                free_slots = [s for s in self._states if s.in_flight < s.max_in_flight]
+                wake = min((s.available_at(now) for s in free_slots), default=None)
+                wait = None if wake is None else max(0.05, wake - now)
+                if give_up is not None:
+                    remaining = give_up - now
+                    if remaining <= 0:
+                        raise TimeoutError("No API key became available")
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def release(self, key):
+        with self._cond:
+            s = self._state(key)
+            if s and s.in_flight > 0:
+                s.in_flight -= 1
+            self._cond.notify_all()
+
+    def penalize(self, key, cooldown=None):
+        # Upstream said "Too Many Attempts": rest this key, others keep working
+        with self._cond:
+            s = self._state(key)
+            if s:
+                s.cooldown_until = time.monotonic() + (cooldown or self.cooldown_seconds)
+                s.tokens = 0
+                s.rate_limited += 1
+            self._cond.notify_all()
+
+    def key_number(self, key):
+        for i, s in enumerate(self._states):
+            if s.key == key:
+                return i + 1
+        return 0
+
+    def stats(self):
+        with self._cond:
+            now = time.monotonic()
+            return [
+                {
+                    "key": i + 1,
+                    "tokens": round(s.tokens, 2),
+                    "in_flight": s.in_flight,
+                    "max_in_flight": s.max_in_flight,
+                    "cooldown_remaining": round(max(0.0, s.cooldown_until - now), 1),
+                    "submitted": s.submitted,
+                    "rate_limited": s.rate_limited
+                }
+                for i, s in enumerate(self._states)
+            ]
+
+    def _state(self, key):
+        for s in self._states:
+            if s.key == key:
+                return s
+        return None
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def shared_key_scheduler(keys, **limits):
+    # All jobs using the same key pool share one scheduler (and its quota view)
+    pool = tuple(keys)
+    with _schedulers_lock:
+        if pool not in _schedulers:
+            _schedulers[pool] = KeyScheduler(pool, **limits)
+        return _schedulers[pool]
+
+def scheduler_stats():
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [s.stats() for s in schedulers]
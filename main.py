@@ -1,11 +1,25 @@
-from fastapi import FastAPI, BackgroundTasks, Request, UploadFile, File, Form, Response, Depends, HTTPException, status
+from fastapi import FastAPI, Request, UploadFile, Form, Response, Depends, HTTPException, status
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as FormFile
 import uvicorn
 import os
-from video_pipeline import VideoPipeline, VideoConfig
+import time
+from video_pipeline import VideoPipeline, VideoConfig, WHISPER_MODELS, downscale_for_ingest
 import threading
+from job_queue import JobStore, JobWorkerPool
+from workspace import WorkspaceManager
+from artifact_cache import cache_stats
+from key_scheduler import scheduler_stats
+from progress_events import ProgressHub
+from metrics import REGISTRY
+from user_store import UserCache, CounterBatcher
+import asyncio
+import json
+import csv
+import io
 from motor.motor_asyncio import AsyncIOMotorClient
 import certifi
 from dotenv import load_dotenv
@@ -35,9 +49,23 @@ client = None
 db = None
 users_collection = None
 
+def on_video_counts_flushed(usernames):
+    user_cache.invalidate(*usernames)
+    leaderboard_cache.clear()
+
+# Authenticated page loads read users from here instead of Mongo
+user_cache = UserCache(ttl_seconds=float(os.getenv("USER_CACHE_SECONDS", "30")))
+# Completed jobs bump video_count here; the server loop writes the tally in one bulk_write per interval
+video_counts = CounterBatcher(
+    "video_count",
+    interval=float(os.getenv("COUNTER_FLUSH_SECONDS", "2")),
+    on_flush=on_video_counts_flushed
+)
+counter_task = None
+
 @app.on_event("startup")
 async def startup_db_client():
-    global client, db, users_collection
+    global client, db, users_collection, counter_task
     if MONGO_URI:
         try:
             # TLS CA File is often needed for Atlas on Windows
@@ -48,6 +76,11 @@ async def startup_db_client():
             # Verify connection
             await client.admin.command('ping')
             print(f"Connected to MongoDB Atlas: {db.name}")
+
+            # Leaderboard reads walk this index instead of sorting the whole collection
+            await users_collection.create_index([("video_count", -1), ("username", 1)], name="leaderboard")
+
+            counter_task = asyncio.create_task(video_counts.run(lambda: users_collection))
         except Exception as e:
             print(f"MongoDB Connection Error: {e}")
             client = None
@@ -55,11 +88,64 @@ async def startup_db_client():
     else:
         print("WARNING: MONGO_URI not found in .env. Auth will fail.")
 
-@app.on_event("shutdown")
 async def shutdown_db_client():
+    if counter_task:
+        counter_task.cancel()
+        try:
+            await counter_task # An in-flight flush restores its tally when cancelled
+        except asyncio.CancelledError:
+            pass
+    await video_counts.flush(users_collection) # Don't lose increments tallied since the last flush
     if client:
         client.close()
 
+# JOB QUEUE CONFIG
+# ==========================================
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "d:/JAK/jobs.db")
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "2"))
+
+# Per-job artifact directories with retention and a disk quota
+workspaces = WorkspaceManager(
+    os.getenv("WORKSPACE_ROOT", "d:/JAK/jobs"),
+    retention_hours=float(os.getenv("WORKSPACE_RETENTION_HOURS", "24")),
+    max_jobs=int(os.getenv("WORKSPACE_MAX_JOBS", "200")),
+    quota_bytes=int(float(os.getenv("WORKSPACE_QUOTA_GB", "20")) * 1024**3)
+)
+
+job_store = None
+worker_pool = None
+active_pipelines = {} # job_id -> running VideoPipeline (live status/logs)
+progress_hub = ProgressHub() # job_id -> ring buffer of pushed progress events
+
+@app.on_event("startup")
+async def startup_job_workers():
+    global job_store, worker_pool
+    job_store = JobStore(JOB_DB_PATH)
+    worker_pool = JobWorkerPool(job_store, run_job, workers=PIPELINE_WORKERS)
+    worker_pool.start()
+    print(f"Job workers started: {PIPELINE_WORKERS}")
+
+    # Optionally load Whisper in the background so the first job doesn't pay for it
+    if os.getenv("WHISPER_WARMUP", "1") == "1":
+        threading.Thread(
+            target=WHISPER_MODELS.warmup,
+            args=(VideoConfig().WHISPER_MODEL_SIZE,),
+            name="whisper-warmup",
+            daemon=True
+        ).start()
+
+async def shutdown_job_workers():
+    if worker_pool:
+        worker_pool.stop()
+    if job_store:
+        job_store.close()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Workers first, so a job finishing while they are joined still lands in the final counter flush
+    await shutdown_job_workers()
+    await shutdown_db_client()
+
 
 def get_password_hash(password):
     return password 
@@ -71,40 +157,61 @@ async def get_current_user(request: Request):
     username = request.cookies.get("session_token")
     if not username:
         return None
+    user = user_cache.get(username)
+    if user is not None:
+        return user
     if users_collection is not None:
-        user = await users_collection.find_one({"username": username})
+        user = await users_collection.find_one({"username": username}, {"password": 0})
+        if user:
+            user_cache.put(username, user)
         return user
     return None
 
 
-pipeline_instance = None
-pipeline_thread = None
+# LEADERBOARD
+# ==========================================
+LEADERBOARD_PAGE_SIZE = int(os.getenv("LEADERBOARD_PAGE_SIZE", "50"))
+LEADERBOARD_CACHE_SECONDS = float(os.getenv("LEADERBOARD_CACHE_SECONDS", "30"))
 
-def selection_sort_users(users):
+# Top page only: (expires_at, rows, has_next); cleared whenever a video count changes
+leaderboard_cache = {}
 
-    n = len(users)
-    for i in range(n):
-        max_idx = i
-        for j in range(i + 1, n):
-            if users[j].get("video_count", 0) > users[max_idx].get("video_count", 0):
-                max_idx = j
-        users[i], users[max_idx] = users[max_idx], users[i]
-    return users
+async def fetch_leaderboard_page(page):
+    if users_collection is None:
+        return [], False
+    if page == 1:
+        cached = leaderboard_cache.get("top")
+        if cached and cached[0] > time.time():
+            return cached[1], cached[2]
+
+    # Sorted, projected and paginated server-side (never loads passwords)
+    cursor = users_collection.find({}, {"_id": 0, "username": 1, "video_count": 1}) \
+        .sort([("video_count", -1), ("username", 1)]) \
+        .skip((page - 1) * LEADERBOARD_PAGE_SIZE) \
+        .limit(LEADERBOARD_PAGE_SIZE + 1)
+    rows = await cursor.to_list(length=LEADERBOARD_PAGE_SIZE + 1)
+    has_next = len(rows) > LEADERBOARD_PAGE_SIZE
+    rows = rows[:LEADERBOARD_PAGE_SIZE]
+
+    if page == 1:
+        leaderboard_cache["top"] = (time.time() + LEADERBOARD_CACHE_SECONDS, rows, has_next)
+    return rows, has_next
 
 
 @app.get("/leaderboard")
-async def leaderboard(request: Request):
+async def leaderboard(request: Request, page: int = 1):
     user = await get_current_user(request)
+    page = max(1, page)
     
-    users_cursor = users_collection.find({})
-    users_list = await users_cursor.to_list(length=1000)
-    
-    sorted_users = selection_sort_users(users_list)
+    rows, has_next = await fetch_leaderboard_page(page)
     
     return templates.TemplateResponse("leaderboard.html", {
         "request": request,
         "user": user,
-        "leaderboard": sorted_users
+        "page": page,
+        "has_next": has_next,
+        "rank_offset": (page - 1) * LEADERBOARD_PAGE_SIZE,
+        "leaderboard": rows
     })
 
 @app.get("/")
@@ -150,93 +257,450 @@ async def login(request: Request, response: Response, username: str = Form(...),
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid credentials"})
     
     # Create Session (Simple Plaintext)
+    user_cache.invalidate(username)
     resp = RedirectResponse(url="/", status_code=303)
     resp.set_cookie(key="session_token", value=username, max_age=86400)
     return resp
 
 @app.get("/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    username = request.cookies.get("session_token")
+    if username:
+        user_cache.invalidate(username)
     resp = RedirectResponse(url="/login", status_code=303)
     resp.delete_cookie("session_token")
     return resp
 
+def run_job(job):
+    job_id = job["id"]
+    username = job["username"]
+    paths = job["payload"].get("uploads", {})
+    events = progress_hub.get(job_id) or progress_hub.create(job_id)
+    pipeline = None
+
+    # Everything after the channel exists is inside the try, so dashboards always get an "end"
+    try:
+        # Batch jobs never pass through /api/start, so retention and quota are enforced here too
+        workspaces.evict(job_store.unfinished_ids())
+        workspace = workspaces.create(job_id)
+        config = VideoConfig()
+        config.update_images(
+            paths.get("front"),
+            paths.get("left"),
+            paths.get("right"),
+            paths.get("back"),
+            work_dir=workspace.path
+        )
+        pipeline = VideoPipeline(config, workspace=workspace, events=events) # Fresh state per job
+        active_pipelines[job_id] = pipeline
+        pipeline.run_full_pipeline()
+    finally:
+        active_pipelines.pop(job_id, None)
+        if pipeline is None:
+            # Setup failed; JobWorkerPool records the error on the job row
+            events.close(stage="Failed", percent=0, video_url=None)
+        else:
+            try:
+                job_store.update(
+                    job_id,
+                    payload={**job["payload"], "timings": pipeline.timings.breakdown()},
+                    status=pipeline.status,
+                    progress=pipeline.progress,
+                    logs=list(pipeline.logs)[-50:],
+                    error=pipeline.error,
+                    finished_at=time.time()
+                )
+            finally:
+                events.close(
+                    stage=pipeline.status,
+                    percent=pipeline.progress,
+                    video_url=job_video_url(job_id) if pipeline.status == "Completed" else None
+                )
+
+    if pipeline.status == "Completed":
+        # Never touch Motor from this thread: its client belongs to the server loop, which flushes the tally
+        video_counts.add(username)
+
+def job_video_url(job_id):
+    return f"/video/{job_id}/final_reel_captioned.mp4"
+
+def job_status_payload(job):
+    pipeline = active_pipelines.get(job["id"])
+    if pipeline:
+        return {
+            "job_id": job["id"],
+            "status": pipeline.status,
+            "progress": pipeline.progress,
+            "logs": list(pipeline.logs)[-10:], # Return last 10 logs
+            "timings": pipeline.timings.breakdown()
+        }
+    payload = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "logs": job["logs"][-10:],
+        "timings": job["payload"].get("timings")
+    }
+    if job["status"] == "Queued":
+        payload["queue_position"] = job_store.queue_position(job["id"])
+    if job["status"] == "Completed":
+        payload["video_url"] = job_video_url(job["id"])
+    return payload
+
 @app.get("/api/status")
-async def get_status():
-    global pipeline_instance
-    if pipeline_instance:
-        return JSONResponse({
-            "status": pipeline_instance.status,
-            "progress": pipeline_instance.progress,
-            "logs": pipeline_instance.logs[-10:] # Return last 10 logs
-        })
+async def get_status(request: Request):
+    # Latest job of the logged-in user (kept for older clients)
+    username = request.cookies.get("session_token")
+    job = job_store.latest_for_user(username) if username else None
+    if job:
+        return JSONResponse(job_status_payload(job))
     return JSONResponse({"status": "Idle", "progress": 0, "logs": []})
 
+def owned_job(request: Request, job_id):
+    # The job row if it belongs to the caller's session, else None (same 404 either way)
+    username = request.cookies.get("session_token")
+    job = job_store.get(job_id)
+    if not job or not username or job["username"] != username:
+        return None
+    return job
+
+@app.get("/api/status/{job_id}")
+async def get_job_status(request: Request, job_id: str):
+    job = owned_job(request, job_id)
+    if not job:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse(job_status_payload(job))
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    # Server-Sent Events: replays the job's ring buffer, then pushes new events as they happen
+    job = owned_job(request, job_id)
+    if not job:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    last_seq = int(request.headers.get("last-event-id") or 0)
+
+    async def stream():
+        channel = progress_hub.get(job_id)
+        if channel is None and job["status"] in ("Held", "Queued", "Running"):
+            # Re-queued after a restart: the worker will publish into this channel
+            channel = progress_hub.create(job_id)
+        if channel is None:
+            # Finished before this server process started: send the stored result once
+            payload = job_status_payload(job)
+            yield f"event: end\ndata: {json.dumps({'stage': payload['status'], 'percent': payload['progress'], 'logs': payload['logs'], 'video_url': payload.get('video_url')})}\n\n"
+            return
+        async for event in channel.subscribe(last_seq):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                yield ": keepalive\n\n"
+                continue
+            yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+# UPLOAD INGEST
+# ==========================================
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.getenv("MAX_UPLOAD_MB", "20")) * 1024**2)
+MULTIPART_OVERHEAD = 64 * 1024 # Boundaries and part headers on top of the file bytes
+UPLOAD_ANGLES = ("front", "left", "right", "back")
+ALLOWED_IMAGE_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp"
+}
+
+def oversized_body(request: Request, limit):
+    # Starlette spools the whole multipart body before the form is readable, so the
+    # declared length is checked first; returns an error response or None
+    length = request.headers.get("content-length")
+    if not length or not length.isdigit():
+        return JSONResponse({"message": "Content-Length required"}, status_code=411)
+    if int(length) > limit:
+        return JSONResponse({"message": f"Upload exceeds {limit // 1024**2} MB"}, status_code=413)
+    return None
+
+async def save_upload(file_obj: UploadFile, dest_path):
+    # Copies in chunks with all disk I/O off the event loop; enforces the size limit as it goes
+    size = 0
+    out = await run_in_threadpool(open, dest_path, "wb")
+    try:
+        while True:
+            chunk = await file_obj.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"{file_obj.filename} exceeds {MAX_UPLOAD_BYTES // 1024**2} MB")
+            await run_in_threadpool(out.write, chunk)
+    finally:
+        await run_in_threadpool(out.close)
+        await file_obj.close()
+    return size
+
 @app.post("/api/start")
-async def start_generation(
-    request: Request,
-    background_tasks: BackgroundTasks,
-    front: UploadFile = File(None),
-    left: UploadFile = File(None),
-    right: UploadFile = File(None),
-    back: UploadFile = File(None)
-):
-    global pipeline_instance, pipeline_thread
-    
+async def start_generation(request: Request):
     user = await get_current_user(request)
     if not user:
         return JSONResponse({"message": "Not authenticated"}, status_code=401)
 
-    if pipeline_thread and pipeline_thread.is_alive():
-        return JSONResponse({"message": "Already running"}, status_code=400)
-    
-    # Ensure upload dir exists
-    upload_dir = "d:/JAK/uploads"
+    rejected = oversized_body(request, len(UPLOAD_ANGLES) * MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD)
+    if rejected:
+        return rejected
+    form = await request.form(max_files=len(UPLOAD_ANGLES))
+    uploads = {}
+    for name in UPLOAD_ANGLES:
+        file_obj = form.get(name)
+        uploads[name] = file_obj if isinstance(file_obj, FormFile) and file_obj.filename else None
+
+    job_id = job_store.new_id()
+    await run_in_threadpool(workspaces.evict, job_store.unfinished_ids())
+
+    # Uploads live inside the job workspace so concurrent jobs never overwrite each other
+    workspace = await run_in_threadpool(workspaces.create, job_id)
+    upload_dir = workspace.file("uploads")
     os.makedirs(upload_dir, exist_ok=True)
     
     # Save uploaded files
+    cfg = VideoConfig()
     saved_paths = {}
-    for name, file_obj in [("front", front), ("left", left), ("right", right), ("back", back)]:
-        if file_obj:
-            file_location = os.path.join(upload_dir, f"{name}_{file_obj.filename}")
-            with open(file_location, "wb+") as file_object:
-                file_object.write(file_obj.file.read())
-            saved_paths[name] = file_location
-        else:
-            saved_paths[name] = None
-
-    pipeline_instance = VideoPipeline() # Re-init for fresh state
-    
-    # Update config with new paths if provided
-    pipeline_instance.cfg.update_images(
-        saved_paths.get("front"),
-        saved_paths.get("left"),
-        saved_paths.get("right"),
-        saved_paths.get("back")
-    )
+    try:
+        for name, file_obj in uploads.items():
+            if file_obj:
+                ext = ALLOWED_IMAGE_TYPES.get(file_obj.content_type)
+                if not ext:
+                    raise HTTPException(status_code=415, detail=f"{name}: unsupported type {file_obj.content_type}")
+                file_location = os.path.join(upload_dir, f"{name}{ext}")
+                await save_upload(file_obj, file_location)
+                try:
+                    await run_in_threadpool(downscale_for_ingest, file_location, cfg.TARGET_W, cfg.TARGET_H)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"{name}: {e}")
+                await run_in_threadpool(workspace.record, file_location)
+                saved_paths[name] = file_location
+            else:
+                saved_paths[name] = None
+    except HTTPException as e:
+        await run_in_threadpool(workspaces.discard, job_id)
+        return JSONResponse({"message": e.detail}, status_code=e.status_code)
+    finally:
+        await form.close()
+
+    job_store.enqueue(user["username"], {"uploads": saved_paths}, job_id=job_id)
+    progress_hub.create(job_id).publish("stage", stage="Queued", percent=0)
+    worker_pool.notify()
     
-    def run_job(username):
-        pipeline_instance.run_full_pipeline()
-        
-        # Simple synchronous-style update for database (Easy Mode)
-        if pipeline_instance.status == "Completed":
-            import asyncio
-            try:
-                # We still need to run the async update, but let's keep it minimal
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop.run_until_complete(users_collection.update_one(
-                    {"username": username},
-                    {"$inc": {"video_count": 1}}
-                ))
-                loop.close()
-                print(f"Video count saved for {username}")
-            except Exception as e:
-                print(f"Save error: {e}")
-
-    pipeline_thread = threading.Thread(target=run_job, args=(user["username"],))
-    pipeline_thread.start()
-    
-    return JSONResponse({"message": "Started", "status": "Initializing", "uploads": saved_paths})
+    return JSONResponse({"message": "Queued", "job_id": job_id, "status": "Queued", "uploads": saved_paths})
+
+# BATCH RUNS
+# ==========================================
+BATCH_IMAGE_ROOT = os.getenv("BATCH_IMAGE_ROOT", "d:/JAK/catalog")
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+BATCH_DESIGN_GROUP = int(os.getenv("BATCH_DESIGN_GROUP", "4")) # Products per scene-design call
+BATCH_ANGLES = ("front", "left", "right", "back")
+
+def resolve_catalog_path(path):
+    # Manifest paths are relative to (and must stay inside) BATCH_IMAGE_ROOT
+    if not path:
+        return None
+    root = os.path.realpath(BATCH_IMAGE_ROOT)
+    full = os.path.realpath(os.path.join(root, path))
+    try:
+        inside = os.path.commonpath([root, full]) == root
+    except ValueError:
+        inside = False # Different drive
+    return full if inside and os.path.isfile(full) else None
+
+def parse_manifest(filename, text):
+    # CSV with a header row, or JSONL; each row has front/left/right/back and an optional product name
+    if filename.lower().endswith(".jsonl") or text.lstrip().startswith("{"):
+        rows = []
+        for n, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"line {n}: {e}")
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+
+    if not rows:
+        raise ValueError("manifest is empty")
+    if len(rows) > MAX_BATCH_SIZE:
+        raise ValueError(f"manifest has {len(rows)} products, the limit is {MAX_BATCH_SIZE}")
+
+    products = []
+    for n, row in enumerate(rows, 1):
+        if not isinstance(row, dict):
+            raise ValueError(f"row {n}: expected an object")
+        uploads = {}
+        for angle in BATCH_ANGLES:
+            uploads[angle] = resolve_catalog_path(str(row.get(angle) or "").strip())
+            if not uploads[angle]:
+                raise ValueError(f"row {n}: {angle} image is missing or outside the catalog")
+        products.append({"product": str(row.get("product") or f"item{n}"), "uploads": uploads})
+    return products
+
+def run_batch_design(batch_id, products):
+    # Scene designs for several products per Gemini call land in the shared prompt cache,
+    # then the held jobs are released and each one finds its design there
+    try:
+        designer = VideoPipeline(VideoConfig())
+        designer.design_scenes_batch(
+            {p["job_id"]: [p["uploads"][a] for a in BATCH_ANGLES] for p in products},
+            group_size=BATCH_DESIGN_GROUP
+        )
+    except Exception as e:
+        print(f"Batch {batch_id} design error: {e}")
+    finally:
+        job_store.release_batch(batch_id)
+        worker_pool.notify()
+
+def batch_summary(batch_id, jobs):
+    now = time.time()
+    counts = {}
+    for j in jobs:
+        counts[j["status"]] = counts.get(j["status"], 0) + 1
+    finished = [j for j in jobs if j["finished_at"]]
+    started = [j["started_at"] for j in jobs if j["started_at"]]
+    remaining = len(jobs) - len(finished)
+    # A finished batch stops its clock at the last job, so throughput doesn't decay afterwards
+    end = max(j["finished_at"] for j in finished) if finished and not remaining else now
+    elapsed = end - min(started) if started else 0.0
+    durations = [j["finished_at"] - j["started_at"] for j in finished if j["started_at"]]
+    per_hour = len(finished) / elapsed * 3600 if elapsed > 0 and finished else 0.0
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "counts": counts,
+        "percent": int(100 * len(finished) / len(jobs)),
+        "elapsed_seconds": round(elapsed, 1),
+        "throughput_per_hour": round(per_hour, 2),
+        "avg_job_seconds": round(sum(durations) / len(durations), 1) if durations else None,
+        "eta_seconds": round(remaining / per_hour * 3600) if per_hour and remaining else None,
+        "jobs": [batch_job_row(j) for j in jobs]
+    }
+
+def batch_job_row(job):
+    # Built from the row (or the live pipeline) alone: no per-job queue_position query on every poll
+    pipeline = active_pipelines.get(job["id"])
+    row = {
+        "job_id": job["id"],
+        "product": job["payload"].get("product"),
+        "status": pipeline.status if pipeline else job["status"],
+        "progress": pipeline.progress if pipeline else job["progress"]
+    }
+    if not pipeline and job["status"] == "Completed":
+        row["video_url"] = job_video_url(job["id"])
+    return row
+
+@app.post("/api/batches")
+async def start_batch(request: Request):
+    user = await get_current_user(request)
+    if not user:
+        return JSONResponse({"message": "Not authenticated"}, status_code=401)
+
+    rejected = oversized_body(request, MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD)
+    if rejected:
+        return rejected
+    form = await request.form(max_files=1)
+    manifest = form.get("manifest")
+    if not isinstance(manifest, FormFile):
+        await form.close()
+        return JSONResponse({"message": "manifest file is required"}, status_code=400)
+    raw = await manifest.read(MAX_UPLOAD_BYTES + 1)
+    await manifest.close()
+    if len(raw) > MAX_UPLOAD_BYTES:
+        return JSONResponse({"message": f"Manifest exceeds {MAX_UPLOAD_BYTES // 1024**2} MB"}, status_code=413)
+    try:
+        products = await run_in_threadpool(parse_manifest, manifest.filename or "", raw.decode("utf-8-sig"))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JSONResponse({"message": f"Invalid manifest: {e}"}, status_code=400)
+
+    # Held until the shared scene design is done, so no job pays for its own Gemini call. The
+    # designs are handed over through the prompt cache, so without it the jobs go straight to the queue
+    shared_design = VideoConfig().PROMPT_CACHE_ENABLED
+    batch_id = job_store.new_id()
+    for p in products:
+        p["job_id"] = job_store.enqueue(
+            user["username"],
+            {"uploads": p["uploads"], "product": p["product"], "batch_id": batch_id},
+            batch_id=batch_id,
+            status="Held" if shared_design else "Queued"
+        )
+    if shared_design:
+        threading.Thread(target=run_batch_design, args=(batch_id, products), name=f"batch-{batch_id[:8]}", daemon=True).start()
+    else:
+        worker_pool.notify()
+
+    return JSONResponse({
+        "message": "Queued",
+        "batch_id": batch_id,
+        "jobs": [{"job_id": p["job_id"], "product": p["product"]} for p in products]
+    })
+
+@app.get("/api/batches/{batch_id}")
+async def get_batch(request: Request, batch_id: str):
+    username = request.cookies.get("session_token")
+    jobs = job_store.batch_jobs(batch_id)
+    if not jobs or jobs[0]["username"] != username:
+        return JSONResponse({"error": "Batch not found"}, status_code=404)
+    return JSONResponse(batch_summary(batch_id, jobs))
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job(request: Request, job_id: str):
+    # Re-runs a failed job in its existing workspace; the pipeline skips every stage whose
+    # checkpointed artifact is still intact, so finished scene renders are never paid for twice
+    user = await get_current_user(request)
+    if not user:
+        return JSONResponse({"message": "Not authenticated"}, status_code=401)
+    job = job_store.get(job_id)
+    if not job or job["username"] != user["username"]:
+        return JSONResponse({"message": "Job not found"}, status_code=404)
+    if job["status"] in ("Held", "Queued", "Running", "Completed"):
+        return JSONResponse({"message": f"Job is {job['status']}"}, status_code=409)
+    if not workspaces.open(job_id):
+        return JSONResponse({"message": "Job workspace has expired"}, status_code=410)
+
+    payload = {**job["payload"], "attempts": job["payload"].get("attempts", 1) + 1}
+    if not job_store.requeue(job_id, payload):
+        return JSONResponse({"message": "Job is already queued"}, status_code=409)
+    progress_hub.create(job_id).publish("stage", stage="Queued", percent=0)
+    worker_pool.notify()
+
+    return JSONResponse({"message": "Queued", "job_id": job_id, "status": "Queued", "attempt": payload["attempts"]})
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus scrape endpoint
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/models")
+async def get_models():
+    return JSONResponse({"whisper": WHISPER_MODELS.stats()})
+
+@app.get("/api/cache")
+async def get_cache_stats():
+    return JSONResponse(cache_stats())
+
+@app.get("/api/keys")
+async def get_key_stats():
+    return JSONResponse({"pools": scheduler_stats()})
+
+@app.get("/api/jobs/{job_id}/files")
+async def get_job_files(request: Request, job_id: str):
+    workspace = workspaces.open(job_id) if owned_job(request, job_id) else None
+    if not workspace:
+        return JSONResponse({"error": "Job not found"}, status_code=404)
+    return JSONResponse({"job_id": job_id, "files": workspace.files()})
+
+@app.get("/video/{job_id}/{filename}")
+async def get_job_video(request: Request, job_id: str, filename: str):
+    file_path = workspaces.resolve(job_id, filename) if owned_job(request, job_id) else None
+    if file_path:
+        return FileResponse(file_path)
+    return JSONResponse({"error": "File not found"}, status_code=404)
 
 @app.get("/video/{filename}")
 async def get_video(filename: str):
@@ -0,0 +1,133 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# =====================================
+# METRICS (Prometheus text format)
+# =====================================
+
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200)
+
+
+def _label_str(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {} # label values -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', bound))} {count}")
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, ('le', '+Inf'))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {series[-2]:.6f}")
+                lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_str(self.labelnames, key)} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "adgen_stage_duration_seconds", "Wall-clock time spent in each pipeline stage", labelnames=("stage",)
+)
+JOB_SECONDS = REGISTRY.histogram(
+    "adgen_job_duration_seconds", "End-to-end pipeline time per job", labelnames=("status",)
+)
+JOBS_TOTAL = REGISTRY.counter("adgen_jobs_total", "Finished pipeline jobs", labelnames=("status",))
+
+# =====================================
+# PER-JOB STAGE TIMER
+# =====================================
+
+class StageTimer:
+    # Records spans for one job; every span is also observed in the process-wide histogram
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, stage, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, **labels)
+
+    def record(self, stage, seconds, **labels):
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        with self._lock:
+            self.spans.append({"stage": stage, "seconds": round(seconds, 3), **labels})
+
+    def breakdown(self):
+        # Totals per stage plus the raw spans (scene spans carry a "scene" label)
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for s in spans:
+            totals[s["stage"]] = round(totals.get(s["stage"], 0.0) + s["seconds"], 3)
+        return {"totals": totals, "spans": spans}
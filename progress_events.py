@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict, deque
+
+# =====================================
+# PUSH-BASED PROGRESS EVENTS
+# =====================================
+
+class ProgressChannel:
+    # Bounded ring buffer of events for one job; async subscribers sleep until something is published
+    def __init__(self, maxlen=500):
+        self.events = deque(maxlen=maxlen)
+        self.closed = False
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._waiters = set()
+
+    def publish(self, kind, **data):
+        # Safe to call from any thread (pipeline workers publish, the server loop consumes)
+        with self._lock:
+            self._seq += 1
+            self.events.append({"seq": self._seq, "type": kind, "time": time.time(), **data})
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass # Subscriber's loop already closed
+
+    def close(self, **data):
+        self.publish("end", **data)
+        self.closed = True
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass
+
+    def since(self, seq):
+        with self._lock:
+            return [e for e in self.events if e["seq"] > seq]
+
+    async def subscribe(self, last_seq=0, keepalive=15):
+        # Yields buffered events after last_seq, then new ones as they arrive; None = keepalive tick
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        try:
+            while True:
+                waiter[1].clear()
+                for e in self.since(last_seq):
+                    last_seq = e["seq"]
+                    yield e
+                if self.closed:
+                    return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), keepalive)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+
+class ProgressHub:
+    # job_id -> channel; open channels stay pinned until closed, only finished ones are trimmed
+    def __init__(self, max_channels=500, buffer_size=500):
+        self.max_channels = max_channels
+        self.buffer_size = buffer_size
+        self._channels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            channel = self._channels.get(job_id)
+            if channel is None or channel.closed:
+                channel = ProgressChannel(self.buffer_size)
+                self._channels[job_id] = channel
+            self._channels.move_to_end(job_id)
+            self._trim()
+            return channel
+
+    def _trim(self):
+        # Drops the oldest closed channels over the cap; a running job's channel is never evicted,
+        # or its worker would publish into an object no new subscriber can reach
+        excess = len(self._channels) - self.max_channels
+        if excess <= 0:
+            return
+        stale = [job_id for job_id, channel in self._channels.items() if channel.closed][:excess]
+        for job_id in stale:
+            del self._channels[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._channels.get(job_id)
@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# =====================================
+# ADAPTIVE STATUS POLLER
+# =====================================
+
+class GenerationFailed(Exception):
+    pass
+
+
+class _PollEntry:
+    def __init__(self, status_url, headers, on_progress, deadline):
+        self.status_url = status_url
+        self.headers = headers
+        self.on_progress = on_progress
+        self.deadline = deadline
+        self.future = Future()
+        self.started = time.time()
+        self.last_progress = None
+        self.first_sample = None # (time, progress) of the first non-zero reading
+        self.interval = None
+
+
+class StatusPoller:
+    # One background thread polls every outstanding request, each on its own schedule
+    def __init__(self, http, min_interval=2.0, max_interval=30.0, backoff=1.6):
+        self.http = http
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="status-poller", daemon=True)
+        self._thread.start()
+
+    def submit(self, status_url, headers, on_progress=None, timeout=900):
+        entry = _PollEntry(status_url, headers, on_progress, time.time() + timeout)
+        entry.interval = self.min_interval
+        self._schedule(entry, time.time())
+        return entry.future
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _schedule(self, entry, when):
+        with self._cond:
+            heapq.heappush(self._heap, (when, next(self._seq), entry))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                when, _, entry = self._heap[0]
+                delay = when - time.time()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                self._poll(entry)
+            except Exception as e:
+                # Never let one bad entry kill the thread every render depends on
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+
+    def _poll(self, entry):
+        now = time.time()
+        if now >= entry.deadline:
+            entry.future.set_exception(TimeoutError(f"No result after {int(now - entry.started)}s"))
+            return
+
+        try:
+            resp = self.http.get(entry.status_url, headers=entry.headers, timeout=(5, 15), retries=1)
+            data = resp.json()["data"]
+            prog = float(data.get("progress", 0) or 0)
+        except Exception:
+            # Transient failure or malformed payload: back off and try again until the deadline
+            entry.interval = min(self.max_interval, entry.interval * self.backoff)
+            self._schedule(entry, min(now + entry.interval, entry.deadline))
+            return
+
+        if entry.on_progress:
+            try:
+                entry.on_progress(prog)
+            except Exception:
+                pass
+
+        if prog >= 100:
+            entry.future.set_result(data)
+            return
+        if data.get("status") == "failed":
+            entry.future.set_exception(GenerationFailed(str(data)))
+            return
+
+        entry.interval = self._next_interval(entry, prog, now)
+        entry.last_progress = prog
+        self._schedule(entry, min(now + entry.interval, entry.deadline))
+
+    def _next_interval(self, entry, prog, now):
+        if prog > 0 and entry.first_sample is None:
+            entry.first_sample = (now, prog)
+
+        if entry.last_progress is not None and prog <= entry.last_progress:
+            # Nothing moved since last time: back off exponentially
+            return min(self.max_interval, entry.interval * self.backoff)
+
+        if entry.first_sample and now > entry.first_sample[0] and prog > entry.first_sample[1]:
+            # Aim to land around half of the estimated remaining time
+            rate = (prog - entry.first_sample[1]) / (now - entry.first_sample[0])
+            eta = (100 - prog) / rate
+            return max(self.min_interval, min(self.max_interval, eta / 2))
+
+        return self.min_interval
+
+
+_shared_poller = None
+_shared_lock = threading.Lock()
+
+def shared_status_poller(http):
+    global _shared_poller
+    with _shared_lock:
+        if _shared_poller is None:
+            _shared_poller = StatusPoller(
+                http,
+                min_interval=float(os.getenv("POLL_MIN_INTERVAL", "2")),
+                max_interval=float(os.getenv("POLL_MAX_INTERVAL", "30")),
+                backoff=float(os.getenv("POLL_BACKOFF", "1.6"))
+            )
+        return _shared_poller
@@ -0,0 +1,75 @@
+import os
+import sys
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from status_poller import GenerationFailed, StatusPoller
+
+
+class _Resp:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeHttp:
+    # Returns the queued payloads for a URL in order, repeating the last one
+    def __init__(self, replies):
+        self.replies = {url: list(payloads) for url, payloads in replies.items()}
+
+    def get(self, url, **kwargs):
+        payloads = self.replies[url]
+        payload = payloads.pop(0) if len(payloads) > 1 else payloads[0]
+        if isinstance(payload, Exception):
+            raise payload
+        return _Resp(payload)
+
+
+def make_poller(replies):
+    return StatusPoller(FakeHttp(replies), min_interval=0.01, max_interval=0.05, backoff=1.5)
+
+
+@pytest.mark.parametrize("bad", [
+    {"data": None},
+    {"data": {"progress": "almost"}},
+    {"data": ["not", "a", "dict"]},
+    {"unexpected": True},
+    ValueError("invalid JSON"),
+])
+def test_malformed_payload_is_retried(bad):
+    poller = make_poller({"u": [bad, {"data": {"progress": 100, "result_url": "x"}}]})
+    assert poller.submit("u", {}, timeout=5).result(timeout=5)["result_url"] == "x"
+
+
+def test_malformed_payload_does_not_kill_thread():
+    poller = make_poller({"bad": [{"data": None}], "good": [{"data": {"progress": 100}}]})
+    stuck = poller.submit("bad", {}, timeout=0.3)
+    assert poller.submit("good", {}, timeout=5).result(timeout=5)["progress"] == 100
+    with pytest.raises((TimeoutError, FutureTimeout)):
+        stuck.result(timeout=5)
+    assert poller._thread.is_alive()
+
+
+def test_deadline_enforced_for_always_malformed():
+    poller = make_poller({"u": [{"data": None}]})
+    with pytest.raises(TimeoutError):
+        poller.submit("u", {}, timeout=0.2).result(timeout=5)
+
+
+def test_failed_status_raises():
+    poller = make_poller({"u": [{"data": {"progress": 10, "status": "failed"}}]})
+    with pytest.raises(GenerationFailed):
+        poller.submit("u", {}, timeout=5).result(timeout=5)
+
+
+def test_progress_callback_errors_are_ignored():
+    def boom(prog):
+        raise RuntimeError("dashboard gone")
+
+    poller = make_poller({"u": [{"data": {"progress": "50"}}, {"data": {"progress": 100}}]})
+    assert poller.submit("u", {}, on_progress=boom, timeout=5).result(timeout=5)["progress"] == 100
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+from pymongo import UpdateOne
+
+# =====================================
+# SHORT-TTL USER CACHE
+# =====================================
+
+class UserCache:
+    # username -> user doc for authenticated page loads; entries are dropped on login/logout/count changes
+    def __init__(self, ttl_seconds=30, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, username):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[username]
+                return None
+            return entry[1]
+
+    def put(self, username, user):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                now = time.time()
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+            self._entries[username] = (time.time() + self.ttl_seconds, user)
+
+    def invalidate(self, *usernames):
+        with self._lock:
+            for username in usernames:
+                self._entries.pop(username, None)
+
+# =====================================
+# BATCHED COUNTER UPDATES
+# =====================================
+
+class CounterBatcher:
+    # Worker threads only add to an in-memory tally; the server loop writes it with one bulk_write per flush
+    def __init__(self, field, interval=2.0, on_flush=None):
+        self.field = field
+        self.interval = interval
+        self.on_flush = on_flush
+        self.pending = {}
+        self._lock = threading.Lock()
+
+    def add(self, username, amount=1):
+        # Safe from any thread, never touches the database
+        with self._lock:
+            self.pending[username] = self.pending.get(username, 0) + amount
+
+    async def flush(self, collection):
+        if collection is None:
+            return 0
+        with self._lock:
+            batch, self.pending = self.pending, {}
+        if not batch:
+            return 0
+        try:
+            await collection.bulk_write(
+                [UpdateOne({"username": u}, {"$inc": {self.field: n}}) for u, n in batch.items()],
+                ordered=False
+            )
+        except BaseException as e:
+            # Put the tally back so the next flush retries it (also when cancelled mid-write)
+            self._restore(batch)
+            if not isinstance(e, Exception):
+                raise
+            print(f"Counter flush error: {e}")
+            return 0
+        if self.on_flush:
+            self.on_flush(list(batch))
+        return len(batch)
+
+    def _restore(self, batch):
+        with self._lock:
+            for u, n in batch.items():
+                self.pending[u] = self.pending.get(u, 0) + n
+
+    async def run(self, get_collection):
+        # Background task on the server's event loop (the loop the Motor client is bound to)
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush(get_collection())
@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+import threading
+import time
+from artifact_cache import hash_file
+
+# =====================================
+# PER-JOB ARTIFACT WORKSPACE
+# =====================================
+
+class JobWorkspace:
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root, job_id):
+        self.job_id = job_id
+        self.path = os.path.join(root, job_id)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.manifest = self._load_manifest()
+        if not os.path.exists(self.file(self.MANIFEST)):
+            self._save_manifest()
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def record(self, path, sha256=None):
+        # Add a produced artifact to the manifest
+        full = os.path.abspath(path)
+        if not os.path.exists(full):
+            return
+        name = self._name(full)
+        entry = {
+            "size": os.path.getsize(full),
+            "created_at": time.time()
+        }
+        if sha256:
+            entry["sha256"] = sha256
+        with self._lock:
+            self.manifest["files"][name] = entry
+            self._save_manifest()
+
+    def verify(self, path):
+        # True if a recorded artifact is still on disk unchanged (size, plus sha256 when known)
+        full = os.path.abspath(path)
+        entry = self.manifest["files"].get(self._name(full))
+        if not entry or not os.path.isfile(full) or os.path.getsize(full) != entry["size"]:
+            return False
+        if entry.get("sha256"):
+            return hash_file(full) == entry["sha256"]
+        return True
+
+    def files(self):
+        return dict(self.manifest["files"])
+
+    def size_bytes(self):
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for f in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, f))
+                except OSError:
+                    pass
+        return total
+
+    def _name(self, full):
+        return os.path.relpath(full, os.path.abspath(self.path)).replace(os.sep, "/")
+
+    def _load_manifest(self):
+        try:
+            with open(self.file(self.MANIFEST), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"job_id": self.job_id, "created_at": time.time(), "files": {}}
+
+    def _save_manifest(self):
+        tmp = self.file(self.MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.file(self.MANIFEST))
+
+
+class WorkspaceManager:
+    def __init__(self, root, retention_hours=24, max_jobs=200, quota_bytes=20 * 1024**3):
+        self.root = root
+        self.retention_seconds = retention_hours * 3600
+        self.max_jobs = max_jobs
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def create(self, job_id):
+        return JobWorkspace(self.root, job_id)
+
+    def open(self, job_id):
+        if not self._safe_name(job_id) or not os.path.isdir(os.path.join(self.root, job_id)):
+            return None
+        return JobWorkspace(self.root, job_id)
+
+    def resolve(self, job_id, filename):
+        # Only serve files that live directly inside the job's workspace
+        if not self._safe_name(job_id) or not self._safe_name(filename):
+            return None
+        path = os.path.join(self.root, job_id, filename)
+        return path if os.path.isfile(path) else None
+
+    def discard(self, job_id):
+        if self._safe_name(job_id):
+            self._remove(job_id)
+
+    def evict(self, protect=()):
+        # Drop expired workspaces first, then the oldest ones until under job count and disk quota
+        protect = set(protect)
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.root):
+                path = os.path.join(self.root, name)
+                if os.path.isdir(path):
+                    ws = JobWorkspace(self.root, name)
+                    entries.append((ws.manifest.get("created_at", 0), name, ws.size_bytes()))
+            entries.sort()
+
+            now = time.time()
+            removed = []
+            kept = []
+            for created_at, name, size in entries:
+                if name not in protect and now - created_at > self.retention_seconds:
+                    self._remove(name)
+                    removed.append(name)
+                else:
+                    kept.append((created_at, name, size))
+
+            total = sum(size for _, _, size in kept)
+            count = len(kept)
+            for created_at, name, size in kept:
+                if count <= self.max_jobs and total <= self.quota_bytes:
+                    break
+                if name in protect:
+                    continue
+                self._remove(name)
+                removed.append(name)
+                total -= size
+                count -= 1
+            return removed
+
+    def _remove(self, name):
+        shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+    def _safe_name(self, name):
+        return bool(name) and name not in (".", "..") and os.path.basename(name) == name and "/" not in name and "\\" not in name